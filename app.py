@@ -1,11 +1,22 @@
 import streamlit as st
+import asyncio
+import collections
+import functools
+import hashlib
 import os
-import json
+import re
+import string
+import threading
+import time
+import json5
+import msgspec
 from datetime import datetime
+from pydantic_core import from_json
 from dotenv import load_dotenv
 
-import google.generativeai as genai
-from supabase import create_client, Client
+# google.generativeai and supabase are imported lazily inside the cached
+# factories below: both drag in heavy transitive deps (grpc/protobuf,
+# httpx/postgrest) that add hundreds of ms to every worker cold start.
 
 # -------------------------
 # Configuration and Setup
@@ -16,25 +27,91 @@ st.set_page_config(page_title="Smart Task Planner", page_icon="🎯", layout="wi
 # --- API Key Configuration ---
 try:
     API_KEY = os.environ["GOOGLE_API_KEY"]
-    genai.configure(api_key=API_KEY)
 except KeyError:
     st.error("🚨 Missing Google API key. Please add it to your environment variables.")
     st.stop()
-except Exception as e:
-    st.error(f"🚨 An error occurred during API configuration: {e}")
-    st.stop()
 
 # --- Supabase Configuration ---
 try:
     SUPABASE_URL = os.environ["SUPABASE_URL"]
     SUPABASE_KEY = os.environ["SUPABASE_KEY"]
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 except KeyError as e:
     st.error(f"🚨 Missing Supabase credentials: {e}. Please add SUPABASE_URL and SUPABASE_KEY to your environment.")
     st.stop()
-except Exception as e:
-    st.error(f"🚨 An error occurred during Supabase configuration: {e}")
-    st.stop()
+
+
+# -------------------------
+# Shared Resources
+# -------------------------
+@st.cache_resource
+def _event_loop():
+    """Starts a dedicated event loop on a background thread.
+
+    Gemini's grpc-asyncio channels are bound to the loop they were created
+    in, and the SDK caches its async client on the (cached) model handle —
+    so every generation must run on the same long-lived loop. A fresh
+    asyncio.run() per click would leave the cached channel pointing at a
+    closed loop and fail with "Event loop is closed" on the second use.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def run_async(coro):
+    """Runs a coroutine on the shared background loop and returns its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop()).result()
+
+
+def iter_async(agen):
+    """Drives an async generator on the shared background loop, yielding
+    each item in the calling (script) thread so Streamlit calls stay on it."""
+    loop = _event_loop()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+        except StopAsyncIteration:
+            break
+
+
+@st.cache_resource
+def _genai():
+    """Imports and configures google.generativeai on first use."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=API_KEY)
+    return genai
+
+
+@st.cache_resource
+def get_supabase():
+    """Builds the shared Supabase client once per Streamlit worker.
+
+    The client talks REST, so Postgres pooling happens server-side — point
+    SUPABASE_URL at the Supavisor-pooled project endpoint (see schema.sql
+    for direct-connection pool sizing). The timeout keeps a stuck request
+    from pinning a pooled connection indefinitely.
+    """
+    import httpx
+    from supabase import ClientOptions, create_client
+
+    options = ClientOptions(
+        postgrest_client_timeout=30,
+        # Reuse connections across reruns: HTTP/2 with keep-alive avoids a
+        # fresh TCP+TLS handshake per query on bursty interactions.
+        httpx_client=httpx.Client(
+            http2=True,
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=30),
+        ),
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+
+
+@st.cache_resource
+def get_model(model_name: str):
+    """Builds a Gemini model handle once per model name per worker."""
+    return _genai().GenerativeModel(model_name)
 
 
 # -------------------------
@@ -47,85 +124,239 @@ AVAILABLE_MODELS = {
     "Gemini 2.0 Flash - Stable": "models/gemini-2.0-flash",
 }
 
+# Frozen once; Streamlit reruns the script on every interaction, so the
+# selectbox options shouldn't be rebuilt each time.
+AVAILABLE_MODELS_KEYS = tuple(AVAILABLE_MODELS.keys())
+
+# Bump this whenever the prompt changes so stale cached plans are not reused.
+PROMPT_VERSION = "1"
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Minimum cosine similarity for a paraphrased goal to count as a cache hit.
+SEMANTIC_MATCH_THRESHOLD = 0.9
+# Looser floor for the History search fallback: related plans should
+# surface, but unrelated/gibberish queries must come back empty instead
+# of returning the nearest rows regardless of distance.
+SEMANTIC_SEARCH_THRESHOLD = 0.75
+
 # -------------------------
 # Database Functions
 # -------------------------
-def save_plan_to_db(goal: str, model_name: str, plan_json: dict):
-    """Saves a generated plan to Supabase."""
+def save_plans_to_db(entries: list):
+    """Saves several generated plans to Supabase in a single round-trip.
+
+    Each entry is a dict with "goal", "model_used" and "plan_json" keys,
+    e.g. as produced by a batch of asyncio.gather'd generations.
+    """
     try:
-        data = {
-            "goal": goal,
-            "model_used": model_name,
-            "plan_json": plan_json
-        }
-        result = supabase.table("task_plans").insert(data).execute()
+        result = get_supabase().table("task_plans").insert(entries).execute()
+        # Invalidate memoized reads so the History tab sees the new plans.
+        get_recent_plans.clear()
+        search_plans_by_goal.clear()
         return {"success": True, "data": result.data}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-def get_recent_plans(limit: int = 10):
-    """Retrieves recent plans from the database."""
+def save_plan_to_db(goal: str, model_name: str, plan_json: dict):
+    """Saves a generated plan to Supabase."""
+    return save_plans_to_db([{
+        "goal": goal,
+        "model_used": model_name,
+        "plan_json": plan_json
+    }])
+
+
+# Columns needed by the History list view; the heavy plan_json column is
+# fetched via get_plan_detail only when a card's "View plan" toggle is on
+# (expander bodies run eagerly, so the expander alone can't gate the fetch).
+PLAN_SUMMARY_COLUMNS = "id, goal, model_used, created_at"
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_recent_plans(limit: int = 10, offset: int = 0):
+    """Retrieves a page of recent plan summaries from the database.
+
+    Memoized so widget interactions (which rerun the whole script) don't
+    re-issue the query; writes clear this cache explicitly.
+    """
     try:
-        result = supabase.table("task_plans")\
-            .select("*")\
+        result = get_supabase().table("task_plans")\
+            .select(PLAN_SUMMARY_COLUMNS)\
             .order("created_at", desc=True)\
-            .limit(limit)\
+            .range(offset, offset + limit - 1)\
             .execute()
         return {"success": True, "data": result.data}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+@st.cache_data(ttl=60, show_spinner=False)
 def search_plans_by_goal(search_term: str):
-    """Searches plans by goal text."""
+    """Searches plan summaries by goal text. Memoized like get_recent_plans.
+
+    Goes through the search_plans RPC (backed by a pg_trgm index, see
+    schema.sql) so matching happens server-side; falls back to a plain
+    ILIKE query if the function hasn't been migrated yet. When the text
+    match comes up empty, retries as a semantic (embedding) search over
+    the trigger-maintained embedding column.
+    """
     try:
-        result = supabase.table("task_plans")\
-            .select("*")\
-            .ilike("goal", f"%{search_term}%")\
-            .order("created_at", desc=True)\
-            .execute()
+        try:
+            result = get_supabase().rpc("search_plans", {"q": search_term}).execute()
+        except Exception:
+            result = get_supabase().table("task_plans")\
+                .select(PLAN_SUMMARY_COLUMNS)\
+                .ilike("goal", f"%{search_term}%")\
+                .order("created_at", desc=True)\
+                .execute()
+        if not result.data:
+            embedding = _embed_goal(search_term)
+            if embedding:
+                result = get_supabase().rpc("semantic_search", {
+                    "query_embedding": embedding,
+                    "match_threshold": SEMANTIC_SEARCH_THRESHOLD,
+                }).execute()
         return {"success": True, "data": result.data}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+@st.cache_data(ttl=300, show_spinner=False)
+def get_plan_detail(plan_id: str):
+    """Fetches the full plan_json for a single plan."""
+    try:
+        result = get_supabase().table("task_plans")\
+            .select("plan_json")\
+            .eq("id", plan_id)\
+            .single()\
+            .execute()
+        return {"success": True, "data": result.data["plan_json"]}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 def delete_plan(plan_id: str):
     """Deletes a plan from the database."""
     try:
-        result = supabase.table("task_plans")\
+        result = get_supabase().table("task_plans")\
             .delete()\
             .eq("id", plan_id)\
             .execute()
+        get_recent_plans.clear()
+        search_plans_by_goal.clear()
+        return {"success": True}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def delete_plans(plan_ids: list):
+    """Deletes several plans in a single round-trip."""
+    try:
+        get_supabase().table("task_plans")\
+            .delete()\
+            .in_("id", plan_ids)\
+            .execute()
+        get_recent_plans.clear()
+        search_plans_by_goal.clear()
         return {"success": True}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
 # -------------------------
-# Core Function
+# Plan Cache Functions
 # -------------------------
-def generate_plan(goal: str, model_name: str):
-    """Generates a structured project plan from a user's goal using the Gemini API."""
-    if not goal:
-        return {"error": "Goal cannot be empty."}
+def _normalize_goal(goal: str) -> str:
+    """Normalizes a goal for cache keying (lowercase, collapse whitespace)."""
+    return " ".join(goal.lower().split())
+
 
-    prompt = f"""
+def _cache_key(goal: str, model_name: str) -> str:
+    """Builds a stable cache key from the prompt version, model and goal."""
+    raw = f"{PROMPT_VERSION}|{model_name}|{_normalize_goal(goal)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _embed_goal(goal: str):
+    """Embeds a goal for semantic cache lookups. Returns None on failure."""
+    try:
+        result = _genai().embed_content(model=EMBEDDING_MODEL, content=goal)
+        return result["embedding"]
+    except Exception:
+        return None
+
+
+def get_cached_plan(goal: str, model_name: str):
+    """Looks up a previously generated plan for this (goal, model) pair.
+
+    Tries an exact key match first, then a semantic (embedding) match so
+    paraphrased goals also hit. Returns the plan dict or None on a miss;
+    cache failures are swallowed so generation always proceeds.
+    """
+    try:
+        key = _cache_key(goal, model_name)
+        result = get_supabase().table("plan_cache")\
+            .select("plan_json")\
+            .eq("key", key)\
+            .limit(1)\
+            .execute()
+        if result.data:
+            return result.data[0]["plan_json"]
+
+        embedding = _embed_goal(goal)
+        if embedding:
+            match = get_supabase().rpc("match_plan_cache", {
+                "query_embedding": embedding,
+                "match_model": model_name,
+                "match_prompt_version": PROMPT_VERSION,
+                "match_threshold": SEMANTIC_MATCH_THRESHOLD,
+            }).execute()
+            if match.data:
+                return match.data[0]["plan_json"]
+    except Exception:
+        pass
+    return None
+
+
+def set_cached_plan(goal: str, model_name: str, plan_json: dict):
+    """Stores a generated plan in the cache.
+
+    The goal embedding is filled in asynchronously by a Postgres trigger
+    (see schema.sql), so the store path costs a single round-trip.
+    """
+    try:
+        entry = {
+            "key": _cache_key(goal, model_name),
+            "goal": goal,
+            "model_used": model_name,
+            "prompt_version": PROMPT_VERSION,
+            "plan_json": plan_json,
+        }
+        get_supabase().table("plan_cache").upsert(entry).execute()
+    except Exception:
+        pass
+
+
+# -------------------------
+# Core Function
+# -------------------------
+# Built once at import time; generate_plan_stream only interpolates the goal.
+_PROMPT_TMPL = string.Template("""
 You are an expert project manager AI. Your task is to break down the user's goal into a structured action plan.
-Goal: "{goal}"
+Goal: "$goal"
 
 Return ONLY a valid JSON object with this exact structure:
-{{
+{
   "plan": [
-    {{
+    {
       "task_id": 1,
       "task_name": "Task name here",
       "description": "Detailed description here",
       "dependencies": [],
       "duration_days": 5
-    }}
+    }
   ]
-}}
+}
 
 Rules:
 - task_id: integer starting from 1
@@ -136,55 +367,238 @@ Rules:
 
 Provide a complete, logical breakdown of the goal into sequential tasks.
 Return ONLY the JSON, no other text or markdown formatting.
-"""
-    
+""")
+
+# Output schema enforced by Gemini's constrained decoding, so responses
+# are plain JSON in the right shape — no markdown fences to peel off.
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "plan": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "task_id": {"type": "integer"},
+                    "task_name": {"type": "string"},
+                    "description": {"type": "string"},
+                    "dependencies": {"type": "array", "items": {"type": "integer"}},
+                    "duration_days": {"type": "integer"},
+                },
+                "required": ["task_id", "task_name", "description", "dependencies", "duration_days"],
+            },
+        }
+    },
+    "required": ["plan"],
+}
+
+# Caps on concurrent Gemini requests and requests per minute, sized for
+# the published rate limits. Bursty clicks (or a batch regeneration) wait
+# here instead of triggering 429 retry storms. The limiter state lives
+# behind st.cache_resource — Streamlit re-execs app.py into a fresh
+# namespace on every rerun, so module-level state would be rebuilt per
+# click and limit nothing. Thread-safe primitives keep it valid no matter
+# which loop or thread drives a generation.
+GEMINI_MAX_CONCURRENCY = 8
+GEMINI_QPM = 500
+
+
+@st.cache_resource
+def _gemini_limiter():
+    """Builds the limiter state shared by all runs and sessions:
+    (concurrency slots, send-time window, window lock)."""
+    return (
+        threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY),
+        collections.deque(maxlen=GEMINI_QPM),
+        threading.Lock(),
+    )
+
+
+def _seconds_until_quota() -> float:
+    """Returns how long to wait for QPM headroom, recording the send time
+    once the request fits in the window."""
+    _, send_times, send_lock = _gemini_limiter()
+    with send_lock:
+        now = time.monotonic()
+        if len(send_times) == GEMINI_QPM and now - send_times[0] < 60:
+            return 60 - (now - send_times[0])
+        send_times.append(now)
+        return 0.0
+
+
+async def _acquire_gemini_slot():
+    """Waits for a free concurrency slot and QPM headroom."""
+    slots = _gemini_limiter()[0]
+    while not slots.acquire(blocking=False):
+        await asyncio.sleep(0.05)
     try:
-        model = genai.GenerativeModel(model_name)
-        
-        # Generate content
-        response = model.generate_content(
-            contents=prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.3,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,
+        while True:
+            wait = _seconds_until_quota()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+    except BaseException:
+        slots.release()
+        raise
+
+
+def _release_gemini_slot():
+    _gemini_limiter()[0].release()
+
+
+# Typed mirror of PLAN_SCHEMA: msgspec parses JSON straight into these
+# structs, and rendering reads C-level slots instead of dict lookups.
+class Task(msgspec.Struct):
+    task_id: int = 0
+    task_name: str = "Unnamed Task"
+    description: str = ""
+    dependencies: list[int] = []
+    duration_days: int = 0
+
+
+class PlanDoc(msgspec.Struct):
+    plan: list[Task] = []
+
+
+@st.cache_resource
+def _gen_config():
+    """Builds the shared GenerationConfig once per worker."""
+    return _genai().GenerationConfig(
+        temperature=0.3,
+        top_p=0.95,
+        top_k=40,
+        max_output_tokens=8192,
+        response_mime_type="application/json",
+        response_schema=PLAN_SCHEMA,
+    )
+
+
+# Matches a fenced block, tolerating a missing closing fence so it also
+# works on partially streamed responses.
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*\n?(.*?)(?:\n?```\s*)?$", re.DOTALL)
+
+
+def _strip_fences(response_text: str) -> str:
+    """Removes markdown code fences the model sometimes wraps its JSON in.
+
+    With response_mime_type="application/json" this is normally a no-op;
+    kept as a cheap guard for models that ignore the constraint.
+    """
+    m = _FENCE_RE.match(response_text)
+    return m.group(1).strip() if m else response_text.strip()
+
+
+def _parse_partial_plan(text: str):
+    """Parses an incomplete JSON response into a plan dict, or None."""
+    try:
+        parsed = from_json(_strip_fences(text.strip()), allow_partial="trailing-strings")
+    except ValueError:
+        return None
+    if isinstance(parsed, dict) and isinstance(parsed.get("plan"), list):
+        return parsed
+    return None
+
+
+async def generate_plan_stream(goal: str, model_name: str):
+    """Generates a structured project plan from a user's goal using the Gemini API.
+
+    Streams the response and yields progressively larger plan dicts as tasks
+    complete, so the UI can render the first task long before the full
+    generation finishes. The final yield is the complete result: either the
+    validated plan dict or an error dict.
+    """
+    if not goal:
+        yield {"error": "Goal cannot be empty."}
+        return
+
+    # The cache helpers make blocking Supabase/embedding calls; run them
+    # on worker threads so they don't stall the shared event loop that
+    # every in-flight generation runs on.
+    cached = await asyncio.to_thread(get_cached_plan, goal, model_name)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = _PROMPT_TMPL.substitute(goal=goal)
+
+    try:
+        model = get_model(model_name)
+
+        # Generate content incrementally, within the rate-limit caps
+        await _acquire_gemini_slot()
+        try:
+            stream = await model.generate_content_async(
+                contents=prompt,
+                generation_config=_gen_config(),
+                stream=True,
             )
-        )
 
-        # Parse the response
-        response_text = response.text.strip()
-        
-        # Try to extract JSON if it's wrapped in markdown code blocks
-        if "```json" in response_text:
-            start = response_text.find("```json") + 7
-            end = response_text.find("```", start)
-            response_text = response_text[start:end].strip()
-        elif response_text.startswith("```"):
-            lines = response_text.split("\n")
-            json_lines = []
-            in_code_block = False
-            for line in lines:
-                if line.startswith("```"):
-                    in_code_block = not in_code_block
+            chunks = []
+            yielded = 0
+            async for chunk in stream:
+                chunk_text = chunk.text
+                if not chunk_text:
                     continue
-                if in_code_block:
-                    json_lines.append(line)
-            response_text = "\n".join(json_lines).strip()
-        
+                chunks.append(chunk_text)
+                # Only attempt a parse when the chunk ends on "}" or "]" —
+                # i.e. a task object may just have closed. Joining and
+                # parsing on every chunk would make total work O(n²) in
+                # the response size.
+                last = chunk_text.rstrip()[-1:]
+                if not last or last not in "}]":
+                    continue
+                partial = _parse_partial_plan("".join(chunks))
+                if partial is not None and len(partial["plan"]) > yielded:
+                    yielded = len(partial["plan"])
+                    yield partial
+        finally:
+            _release_gemini_slot()
+
+        # Parse the complete response
+        response_text = _strip_fences("".join(chunks).strip())
+
         try:
-            plan_json = json.loads(response_text)
-            # Basic validation to ensure the structure is correct
-            if "plan" in plan_json and isinstance(plan_json["plan"], list):
-                return plan_json
-            else:
-                 return {"error": "AI returned JSON in an unexpected format.", "raw": response_text}
-        except json.JSONDecodeError as je:
-            return {"error": f"AI failed to return valid JSON: {je}", "raw": response_text}
+            try:
+                # Parses and validates against the Task/PlanDoc structs in
+                # a single C-level pass.
+                doc = msgspec.json.decode(response_text.encode(), type=PlanDoc)
+            except msgspec.DecodeError:
+                # LLM output is often lightly malformed (trailing commas,
+                # single quotes); json5 is lenient enough to recover it.
+                doc = msgspec.convert(json5.loads(response_text), PlanDoc, strict=False)
+            # JSON-safe builtins for storage and the Streamlit handler.
+            plan_json = msgspec.to_builtins(doc)
+            await asyncio.to_thread(set_cached_plan, goal, model_name, plan_json)
+            yield plan_json
+        except (ValueError, msgspec.MsgspecError) as je:
+            yield {"error": f"AI failed to return valid JSON: {je}", "raw": response_text}
 
     except Exception as e:
         # Catch potential API errors
-        return {"error": f"An error occurred while calling the AI model: {e}"}
+        yield {"error": f"An error occurred while calling the AI model: {e}"}
+
+
+async def generate_plan_async(goal: str, model_name: str):
+    """Non-streaming wrapper: runs generate_plan_stream to completion.
+
+    Useful when the progressive output isn't needed, e.g. when batching
+    several generations with asyncio.gather.
+    """
+    result = {"error": "The AI returned an empty response."}
+    async for result in generate_plan_stream(goal, model_name):
+        pass
+    return result
+
+
+async def generate_plans_async(pairs: list):
+    """Generates plans for several (goal, model_name) pairs concurrently.
+
+    The shared slot/QPM limiter keeps the batch under the Gemini rate
+    limits, so callers can gather as many pairs as they like.
+    """
+    return await asyncio.gather(
+        *(generate_plan_async(goal, model_name) for goal, model_name in pairs)
+    )
 
 
 def display_plan(tasks: list):
@@ -192,19 +606,24 @@ def display_plan(tasks: list):
     if not tasks:
         st.warning("The plan is empty.")
         return
-    
+
+    # Coerce raw dicts (JSONB rows, partial stream parses) into Task
+    # structs so rendering reads typed slots instead of dict lookups.
+    if isinstance(tasks[0], dict):
+        try:
+            tasks = msgspec.convert(tasks, list[Task], strict=False)
+        except msgspec.ValidationError:
+            st.warning("The plan contains malformed tasks.")
+            return
+
     # Sort tasks by ID for a logical display order
-    sorted_tasks = sorted(tasks, key=lambda x: x.get("task_id", 0))
-    
+    sorted_tasks = sorted(tasks, key=lambda t: t.task_id)
+
     for task in sorted_tasks:
-        task_id = task.get('task_id', '?')
-        task_name = task.get('task_name', 'Unnamed Task')
-        duration = task.get('duration_days', '?')
-        dependencies = task.get("dependencies", [])
-        deps_str = ", ".join(map(str, dependencies)) if dependencies else "None"
-
-        with st.expander(f"**Task {task_id}: {task_name}** ({duration} days)"):
-            st.markdown(f"**Description:** {task.get('description', 'No description provided.')}")
+        deps_str = ", ".join(map(str, task.dependencies)) if task.dependencies else "None"
+
+        with st.expander(f"**Task {task.task_id}: {task.task_name}** ({task.duration_days} days)"):
+            st.markdown(f"**Description:** {task.description or 'No description provided.'}")
             st.markdown(f"**Dependencies:** Task(s) {deps_str}")
 
 
@@ -239,15 +658,25 @@ with tab1:
     with col2:
         selected_model_display = st.selectbox(
             "Select Model:",
-            options=list(AVAILABLE_MODELS.keys()),
+            options=AVAILABLE_MODELS_KEYS,
             index=0  # Default to Gemini 2.0 Flash Experimental
         )
         selected_model = AVAILABLE_MODELS[selected_model_display]
 
     if st.button("Generate Plan", type="primary", use_container_width=True):
         if goal_input:
-            with st.spinner("🧠 AI is thinking... Please wait."):
-                result = generate_plan(goal_input, selected_model)
+            status = st.empty()
+            preview = st.empty()
+            status.info("🧠 AI is thinking... Tasks appear as they are generated.")
+
+            result = {"error": "The AI returned an empty response."}
+            for result in iter_async(generate_plan_stream(goal_input, selected_model)):
+                tasks = result.get("plan")
+                if tasks:
+                    with preview.container():
+                        display_plan(tasks)
+            status.empty()
+            preview.empty()
 
             if "error" in result:
                 st.error(f'**Error:** {result["error"]}')
@@ -280,29 +709,45 @@ with tab1:
     st.markdown("---")
     st.caption(f"Using model: `{selected_model}`")
 
+@functools.lru_cache(maxsize=1024)
+def _parse_iso(timestamp: str) -> datetime:
+    """Parses a Supabase ISO timestamp; memoized since fragments re-render
+    the same rows on every interaction."""
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
 # TAB 2: View History
-with tab2:
+@st.fragment
+def history_fragment():
+    """Renders the History tab.
+
+    Runs as a fragment so interactions here (deletes, expanders) only
+    re-execute this function instead of the whole script.
+    """
     st.title("📚 Plan History")
     st.write("Browse and search your previously generated plans.")
     
     # Search functionality
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3 = st.columns([3, 1, 1])
     with col1:
         search_query = st.text_input("🔍 Search plans by goal:", key="search_query")
     with col2:
+        page = st.number_input("Page:", min_value=1, value=1, step=1, key="history_page")
+    with col3:
         st.write("")
         st.write("")
         if st.button("Search", use_container_width=True):
             st.session_state.search_triggered = True
-    
+
     # Fetch and display plans
+    PAGE_SIZE = 20
     if search_query and st.session_state.get("search_triggered", False):
         with st.spinner("Searching..."):
             plans_result = search_plans_by_goal(search_query)
             st.session_state.search_triggered = False
     else:
         with st.spinner("Loading recent plans..."):
-            plans_result = get_recent_plans(20)
+            plans_result = get_recent_plans(PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
     
     if plans_result["success"]:
         plans = plans_result["data"]
@@ -311,14 +756,16 @@ with tab2:
             st.info("No plans found. Generate your first plan in the 'Generate Plan' tab!")
         else:
             st.success(f"Found {len(plans)} plan(s)")
-            
+
+            # Checked plans are deleted together in one round-trip.
+            selected_ids = []
+
             for plan in plans:
                 plan_id = plan["id"]
                 goal = plan["goal"]
                 model_used = plan["model_used"]
-                created_at = datetime.fromisoformat(plan["created_at"].replace("Z", "+00:00"))
-                plan_json = plan["plan_json"]
-                
+                created_at = _parse_iso(plan["created_at"])
+
                 with st.expander(f"🎯 {goal[:100]}{'...' if len(goal) > 100 else ''}", expanded=False):
                     col1, col2 = st.columns([3, 1])
                     
@@ -327,18 +774,39 @@ with tab2:
                         st.caption(f"Created: {created_at.strftime('%Y-%m-%d %H:%M:%S')} | Model: {model_used}")
                     
                     with col2:
+                        if st.checkbox("Select", key=f"select_{plan_id}"):
+                            selected_ids.append(plan_id)
                         if st.button("🗑️ Delete", key=f"delete_{plan_id}"):
                             delete_result = delete_plan(plan_id)
                             if delete_result["success"]:
                                 st.success("Deleted!")
-                                st.rerun()
+                                st.rerun(scope="fragment")
                             else:
                                 st.error(f"Failed to delete: {delete_result.get('error')}")
                     
                     st.markdown("---")
-                    if "plan" in plan_json:
-                        display_plan(plan_json["plan"])
+                    # Expander bodies execute eagerly, so the heavy
+                    # plan_json fetch is gated behind an explicit toggle.
+                    if st.toggle("View plan", key=f"view_{plan_id}"):
+                        detail_result = get_plan_detail(plan_id)
+                        if not detail_result["success"]:
+                            st.error(f"Failed to load plan: {detail_result.get('error')}")
+                        elif "plan" in detail_result["data"]:
+                            display_plan(detail_result["data"]["plan"])
+                        else:
+                            st.json(detail_result["data"])
+
+            if selected_ids:
+                if st.button(f"🗑️ Delete {len(selected_ids)} selected plan(s)", type="primary"):
+                    delete_result = delete_plans(selected_ids)
+                    if delete_result["success"]:
+                        st.success(f"Deleted {len(selected_ids)} plan(s)!")
+                        st.rerun(scope="fragment")
                     else:
-                        st.json(plan_json)
+                        st.error(f"Failed to delete: {delete_result.get('error')}")
     else:
         st.error(f"Failed to load plans: {plans_result.get('error', 'Unknown error')}")
+
+
+with tab2:
+    history_fragment()
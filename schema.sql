@@ -0,0 +1,145 @@
+-- Supabase schema for the Smart Task Planner.
+-- Run these statements in the Supabase SQL editor.
+--
+-- Connection pooling: the app goes through the Supabase REST API, so use
+-- the Supavisor-pooled project URL to stay under the free-tier connection
+-- cap. If you ever connect directly (SQLAlchemy/psycopg), use the pooled
+-- port 6543 with ?pgbouncer=true&connection_limit=1&sslmode=require, or
+-- size the engine pool conservatively:
+--   create_engine(DB_URL, pool_size=3, max_overflow=2, pool_pre_ping=True,
+--                 pool_recycle=1800, pool_timeout=30)
+
+-- Generated plans (used by the app's History tab).
+create table if not exists task_plans (
+    id uuid primary key default gen_random_uuid(),
+    goal text not null,
+    model_used text not null,
+    plan_json jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+-- Trigram index so goal search ('%term%') uses an index lookup instead
+-- of a sequential scan once the table grows.
+create extension if not exists pg_trgm;
+
+create index if not exists task_plans_goal_trgm
+    on task_plans using gin (goal gin_trgm_ops);
+
+-- Server-side goal search used by the History tab. Returns only the
+-- summary columns the list view renders.
+create or replace function search_plans(q text)
+returns table (id uuid, goal text, model_used text, created_at timestamptz)
+language sql stable
+as $$
+    select id, goal, model_used, created_at
+    from task_plans
+    where goal ilike '%' || q || '%'
+    order by created_at desc
+    limit 50;
+$$;
+
+-- Persistent LLM response cache keyed on (prompt version, model, goal).
+-- The embedding column enables semantic hits for paraphrased goals.
+create extension if not exists vector;
+
+create table if not exists plan_cache (
+    key text primary key,
+    goal text,
+    model_used text not null,
+    prompt_version text not null default '1',
+    embedding vector(768),
+    plan_json jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+alter table plan_cache
+    add column if not exists prompt_version text not null default '1';
+
+-- Embeddings are generated server-side: a pg_net trigger posts each new
+-- row to the `embed-goal` Edge Function, which calls text-embedding-004
+-- and UPDATEs the row's embedding. This keeps the app's insert path free
+-- of a second embedding round-trip. Configure the two settings below with
+--   alter database postgres set app.embed_function_url = '<function url>';
+--   alter database postgres set app.service_role_key = '<service key>';
+alter table task_plans add column if not exists embedding vector(768);
+
+create index if not exists task_plans_embedding_ivfflat
+    on task_plans using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+
+create index if not exists plan_cache_embedding_ivfflat
+    on plan_cache using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+
+create extension if not exists pg_net;
+
+create or replace function queue_goal_embedding()
+returns trigger
+language plpgsql security definer
+as $$
+begin
+    -- The Edge Function is optional: without the settings below, skip
+    -- embedding rather than aborting the INSERT (net.http_post rejects
+    -- a NULL url).
+    if current_setting('app.embed_function_url', true) is null then
+        return new;
+    end if;
+    perform net.http_post(
+        url := current_setting('app.embed_function_url', true),
+        headers := jsonb_build_object(
+            'Content-Type', 'application/json',
+            'Authorization', 'Bearer ' || current_setting('app.service_role_key', true)
+        ),
+        body := jsonb_build_object(
+            'table', TG_TABLE_NAME,
+            'row', to_jsonb(new) - 'plan_json' - 'embedding'
+        )
+    );
+    return new;
+end;
+$$;
+
+create or replace trigger task_plans_embed
+    after insert on task_plans
+    for each row execute function queue_goal_embedding();
+
+create or replace trigger plan_cache_embed
+    after insert on plan_cache
+    for each row execute function queue_goal_embedding();
+
+-- ANN search over plan goals, used when the trigram search finds nothing.
+-- The threshold keeps unrelated queries from returning the nearest rows
+-- regardless of distance.
+create or replace function semantic_search(
+    query_embedding vector(768),
+    match_threshold float,
+    match_count int default 20
+)
+returns table (id uuid, goal text, model_used text, created_at timestamptz)
+language sql stable
+as $$
+    select id, goal, model_used, created_at
+    from task_plans
+    where embedding is not null
+      and 1 - (embedding <=> query_embedding) >= match_threshold
+    order by embedding <=> query_embedding
+    limit match_count;
+$$;
+
+-- Nearest-neighbour lookup for the semantic cache path.
+create or replace function match_plan_cache(
+    query_embedding vector(768),
+    match_model text,
+    match_prompt_version text,
+    match_threshold float
+)
+returns table (plan_json jsonb)
+language sql stable
+as $$
+    select plan_json
+    from plan_cache
+    where model_used = match_model
+      and prompt_version = match_prompt_version
+      and embedding is not null
+      and 1 - (embedding <=> query_embedding) >= match_threshold
+    order by embedding <=> query_embedding
+    limit 1;
+$$;